@@ -0,0 +1,100 @@
+"""
+Measures how long a fresh attempt-service process takes to come up.
+
+Reports, per run, the time to import src.main, the time until the port
+answers /ready, and the per-phase startup durations the service records in
+its lifespan (DB pool pre-warm, NATS connect, subscriptions). uvicorn binds
+the port only after lifespan startup finishes, so "serving" is the first
+moment any endpoint answers; /health would report the same time.
+Needs the same Postgres and NATS the service would use (see .env).
+
+    python scripts/measure_startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure_import() -> float:
+    out = subprocess.run(
+        [
+            sys.executable, "-c",
+            "import time; t = time.perf_counter(); import src.main; "
+            "print(time.perf_counter() - t)"
+        ],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def wait_for_ready(url: str, deadline: float) -> tuple[float | None, dict]:
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as resp:
+                if resp.status == 200:
+                    return time.perf_counter(), json.loads(resp.read()).get("startup", {})
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.02)
+    return None, {}
+
+
+def measure_boot(port: int, timeout: float) -> tuple[float | None, dict]:
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        ready, phases = wait_for_ready(f"http://127.0.0.1:{port}/ready", start + timeout)
+        return (ready - start if ready else None), phases
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def summarize(label: str, values: list[float | None]):
+    ok = [v for v in values if v is not None]
+    if not ok:
+        print(f"{label:>14}: no successful runs")
+        return
+    print(
+        f"{label:>14}: median {statistics.median(ok):.3f}s  "
+        f"min {min(ok):.3f}s  max {max(ok):.3f}s  ({len(ok)}/{len(values)} ok)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=18003)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    results = {"import": [], "serving": []}
+    for run in range(1, args.runs + 1):
+        imported = measure_import()
+        serving, phases = measure_boot(args.port, args.timeout)
+        results["import"].append(imported)
+        results["serving"].append(serving)
+        for phase, seconds in phases.items():
+            results.setdefault(phase, []).append(seconds)
+        print(f"run {run}: import {imported:.3f}s  serving {serving}  phases {phases}")
+
+    for label, values in results.items():
+        summarize(label, values)
+
+
+if __name__ == "__main__":
+    main()
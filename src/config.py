@@ -8,6 +8,17 @@ class Settings(BaseSettings):
     port: int = 8003
     logfire_token: str | None = None
     logfire_service_name: str | None = None
+    export_chunk_size: int = 100
+    export_max_chunk_size: int = 1000
+    export_max_chunk_bytes: int = 512 * 1024
+    partition_months_ahead: int = 3
+    partition_retention_months: int = 24
+    # Must point at durable storage (a mounted volume), never the container fs
+    partition_archive_dir: str | None = None
+    run_migrations: bool = False
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_prewarm_connections: int = 2
     
     class Config:
         env_file = ".env"
@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from src.models import Attempt
+from sqlalchemy import func, select, case, delete, distinct, update
+from sqlalchemy.dialects.postgresql import insert
+from src.models import Attempt, ExerciseStats, ExerciseStatsUser
 from datetime import datetime, timezone
 
 
@@ -31,16 +32,28 @@ def create_attempt(
     return attempt
 
 
-def get_attempt_by_id(db: Session, attempt_id: int):
-    return db.query(Attempt).filter(Attempt.id == attempt_id).first()
+def get_attempt_by_id(db: Session, attempt_id: int, attempted_at: datetime = None):
+    query = db.query(Attempt).filter(Attempt.id == attempt_id)
+    
+    # Without the partition key the id lookup probes every partition
+    if attempted_at:
+        query = query.filter(Attempt.attempted_at == attempted_at)
+    
+    return query.first()
 
 
-def get_user_attempts(db: Session, user_id: int):
-    attempts = db.query(Attempt).filter(
+def get_user_attempts(db: Session, user_id: int, since: datetime = None):
+    query = db.query(Attempt).filter(
         Attempt.user_id == user_id
     ).order_by(
         Attempt.attempted_at.desc()
-    ).all()
+    )
+    
+    # Filtering on the partition key lets Postgres skip older partitions.
+    if since:
+        query = query.filter(Attempt.attempted_at >= since)
+    
+    attempts = query.all()
     
     result = []
     for attempt in attempts:
@@ -55,19 +68,45 @@ def get_user_attempts(db: Session, user_id: int):
     return result
 
 
-def get_exercise_attempts(db: Session, exercise_id: int, limit: int = None):
+def get_exercise_attempts(db: Session, exercise_id: int, limit: int = None, since: datetime = None):
     query = db.query(Attempt).filter(
         Attempt.exercise_id == exercise_id
     ).order_by(
         Attempt.attempted_at.desc()
     )
     
+    if since:
+        query = query.filter(Attempt.attempted_at >= since)
+    
     if limit:
         query = query.limit(limit)
     
     return query.all()
 
 
+def iter_exercise_attempts(db: Session, exercise_id: int, chunk_size: int = 500, since: datetime = None):
+    query = db.query(Attempt).filter(
+        Attempt.exercise_id == exercise_id
+    ).order_by(
+        Attempt.attempted_at.desc()
+    )
+    
+    if since:
+        query = query.filter(Attempt.attempted_at >= since)
+    
+    query = query.yield_per(chunk_size)
+    
+    chunk = []
+    for attempt in query:
+        chunk.append(attempt)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    
+    if chunk:
+        yield chunk
+
+
 def get_best_attempt_for_exercise(db: Session, user_id: int, exercise_id: int):
     attempt = db.query(Attempt).filter(
         Attempt.user_id == user_id,
@@ -91,24 +130,15 @@ def get_best_attempt_for_exercise(db: Session, user_id: int, exercise_id: int):
 
 
 def get_user_best_attempts(db: Session, user_id: int):
-    subquery = db.query(
-        Attempt.exercise_id,
-        func.max(
-            Attempt.stars * 100 + Attempt.score * 10 + 
-            func.extract('epoch', Attempt.attempted_at) / 1000000000
-        ).label('best_score')
-    ).filter(
+    # DISTINCT ON returns only the first (best) row per exercise in the given
+    # order, so the database sends one row per exercise instead of a join
+    # that had to be deduplicated here.
+    attempts = db.query(Attempt).filter(
         Attempt.user_id == user_id
-    ).group_by(
+    ).distinct(
         Attempt.exercise_id
-    ).subquery()
-    
-    attempts = db.query(Attempt).join(
-        subquery,
-        (Attempt.exercise_id == subquery.c.exercise_id)
-    ).filter(
-        Attempt.user_id == user_id
     ).order_by(
+        Attempt.exercise_id,
         Attempt.stars.desc(),
         Attempt.score.desc(),
         Attempt.attempted_at.desc()
@@ -116,12 +146,161 @@ def get_user_best_attempts(db: Session, user_id: int):
     
     best_attempts = {}
     for attempt in attempts:
-        if attempt.exercise_id not in best_attempts:
-            best_attempts[attempt.exercise_id] = {
-                "exercise_id": attempt.exercise_id,
-                "stars": attempt.stars,
-                "score": attempt.score,
-                "attempted_at": attempt.attempted_at.isoformat()
-            }
+        best_attempts[attempt.exercise_id] = {
+            "exercise_id": attempt.exercise_id,
+            "stars": attempt.stars,
+            "score": attempt.score,
+            "attempted_at": attempt.attempted_at.isoformat()
+        }
     
     return best_attempts
+
+
+def complete_attempt(db: Session, attempt_id: int, score: int, stars: int, attempted_at: datetime = None):
+    """
+    Marks an attempt completed in a single conditional UPDATE. Returns the
+    graded row, or None if the attempt was already completed, so concurrent
+    deliveries of the same result can't both claim it. Does not commit.
+    """
+    stmt = update(Attempt).where(
+        Attempt.id == attempt_id,
+        Attempt.status != 'completed'
+    )
+    if attempted_at:
+        stmt = stmt.where(Attempt.attempted_at == attempted_at)
+    
+    return db.execute(
+        stmt.values(
+            score=score,
+            stars=stars,
+            status='completed'
+        ).returning(
+            Attempt.id,
+            Attempt.user_id,
+            Attempt.exercise_id,
+            Attempt.score,
+            Attempt.stars
+        ).execution_options(synchronize_session=False)
+    ).first()
+
+
+def record_graded_attempt_stats(db: Session, attempt: Attempt):
+    """
+    Folds one freshly graded attempt into the per-exercise counters using
+    atomic upserts. Does not commit, so the caller can keep the counter
+    update in the same transaction as the attempt itself.
+    """
+    new_user = db.execute(
+        insert(ExerciseStatsUser).values(
+            exercise_id=attempt.exercise_id,
+            user_id=attempt.user_id
+        ).on_conflict_do_nothing()
+    ).rowcount == 1
+    
+    stars = min(max(attempt.stars, 0), 3)
+    values = {
+        "attempt_count": 1,
+        "passed_count": 1 if attempt.stars > 0 else 0,
+        "score_total": attempt.score,
+        "unique_users": 1 if new_user else 0,
+        "stars_0": 1 if stars == 0 else 0,
+        "stars_1": 1 if stars == 1 else 0,
+        "stars_2": 1 if stars == 2 else 0,
+        "stars_3": 1 if stars == 3 else 0,
+    }
+    
+    stmt = insert(ExerciseStats).values(exercise_id=attempt.exercise_id, **values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ExerciseStats.exercise_id],
+        set_={
+            name: getattr(ExerciseStats, name) + stmt.excluded[name]
+            for name in values
+        }
+    )
+    db.execute(stmt)
+
+
+def _stats_to_dict(exercise_id: int, stats: ExerciseStats = None):
+    if not stats or not stats.attempt_count:
+        return {
+            "exercise_id": exercise_id,
+            "attempt_count": 0,
+            "unique_users": 0,
+            "pass_rate": 0.0,
+            "average_score": 0.0,
+            "star_distribution": {"0": 0, "1": 0, "2": 0, "3": 0}
+        }
+    
+    return {
+        "exercise_id": exercise_id,
+        "attempt_count": stats.attempt_count,
+        "unique_users": stats.unique_users,
+        "pass_rate": stats.passed_count / stats.attempt_count,
+        "average_score": stats.score_total / stats.attempt_count,
+        "star_distribution": {
+            "0": stats.stars_0,
+            "1": stats.stars_1,
+            "2": stats.stars_2,
+            "3": stats.stars_3
+        }
+    }
+
+
+def get_exercise_stats(db: Session, exercise_ids: list[int]):
+    rows = db.query(ExerciseStats).filter(
+        ExerciseStats.exercise_id.in_(exercise_ids)
+    ).all()
+    
+    by_id = {row.exercise_id: row for row in rows}
+    return {
+        exercise_id: _stats_to_dict(exercise_id, by_id.get(exercise_id))
+        for exercise_id in exercise_ids
+    }
+
+
+def fill_exercise_stats(db):
+    """
+    Inserts counters computed from every completed attempt. Expects empty
+    stats tables and does not commit; works on a Session or a Connection.
+    """
+    completed = Attempt.status == 'completed'
+    
+    db.execute(
+        insert(ExerciseStatsUser).from_select(
+            ["exercise_id", "user_id"],
+            select(Attempt.exercise_id, Attempt.user_id).where(completed).distinct()
+        )
+    )
+    db.execute(
+        insert(ExerciseStats).from_select(
+            [
+                "exercise_id", "attempt_count", "passed_count", "score_total",
+                "unique_users", "stars_0", "stars_1", "stars_2", "stars_3"
+            ],
+            select(
+                Attempt.exercise_id,
+                func.count(),
+                func.count(case((Attempt.stars > 0, 1))),
+                func.coalesce(func.sum(Attempt.score), 0),
+                func.count(distinct(Attempt.user_id)),
+                func.count(case((Attempt.stars <= 0, 1))),
+                func.count(case((Attempt.stars == 1, 1))),
+                func.count(case((Attempt.stars == 2, 1))),
+                func.count(case((Attempt.stars >= 3, 1)))
+            ).where(completed).group_by(Attempt.exercise_id)
+        )
+    )
+
+
+def rebuild_exercise_stats(db: Session):
+    """
+    Wipes and recomputes every counter from the attempts still in the table.
+    The initial backfill happens in init_db when the stats table is created;
+    this is a repair tool. Attempts in archived partitions are gone from the
+    table, so a rebuild after archive-partitions drops their history from
+    the stats for good.
+    """
+    db.execute(delete(ExerciseStatsUser))
+    db.execute(delete(ExerciseStats))
+    fill_exercise_stats(db)
+    db.commit()
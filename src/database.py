@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 from src.config import settings
 from src.models import Base
@@ -9,7 +9,13 @@ SessionLocal = None
 def get_engine():
     global engine
     if engine is None:
-        engine = create_engine(settings.database_url, echo=False, pool_pre_ping=True)
+        engine = create_engine(
+            settings.database_url,
+            echo=False,
+            pool_pre_ping=True,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow
+        )
     return engine
 
 def get_session_local():
@@ -26,7 +32,48 @@ def get_db():
     finally:
         db.close()
 
+def prewarm_pool(connections: int = None):
+    """
+    Opens connections up front and returns them to the pool, so the first
+    requests on a new pod don't pay for connection setup.
+    """
+    if connections is None:
+        connections = settings.db_prewarm_connections
+    connections = min(connections, settings.db_pool_size)
+
+    engine = get_engine()
+    opened = []
+    try:
+        for _ in range(connections):
+            conn = engine.connect()
+            conn.execute(text("SELECT 1"))
+            opened.append(conn)
+    finally:
+        for conn in opened:
+            conn.close()
+    print(f"Database pool warmed with {len(opened)} connections")
+
 def init_db():
+    from src import crud, partitions
+    from src.models import ExerciseStats
+
     engine = get_engine()
-    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        # Pods starting together would race on CREATE TABLE otherwise
+        conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('attempt-service-init-db'))"))
+        stats_existed = conn.execute(
+            text("SELECT to_regclass(:name)"), {"name": ExerciseStats.__tablename__}
+        ).scalar() is not None
+        Base.metadata.create_all(bind=conn)
+        # Backfill in the same transaction that creates the stats table, so
+        # no handler can count a grading result before history is in.
+        if not stats_existed:
+            crud.fill_exercise_stats(conn)
+            print("Exercise stats backfilled from existing attempts")
+        if partitions.is_partitioned(conn):
+            partitions.ensure_partitions(conn)
+        else:
+            print(f"WARNING: {partitions.PARENT_TABLE} is not partitioned, "
+                  "run 'python -m src.maintenance migrate-partitioned' "
+                  "with the service scaled to zero")
     print("Database initialized")
\ No newline at end of file
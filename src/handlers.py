@@ -5,8 +5,10 @@ from src.schemas import (
 )
 from src import grading
 from src.nats_client import NATSClient
+from src.config import settings
 from src import crud
 import json
+from datetime import datetime, timezone
 
 _nats_client: NATSClient = None
 
@@ -14,6 +16,20 @@ def set_nats_client(client: NATSClient):
     global _nats_client
     _nats_client = client
 
+def _parse_timestamp(value: str):
+    if not value:
+        return None
+    
+    # attempted_at is stored as naive UTC, compare like with like
+    value = datetime.fromisoformat(value)
+    if value.tzinfo:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def _parse_since(data: dict):
+    """Optional ISO-8601 'since' filter; lets queries prune old partitions."""
+    return _parse_timestamp(data.get("since"))
+
 async def handle_create_attempt(data: dict):
     print(f"Received attempt submission: {list(data.keys())}")
     
@@ -53,6 +69,8 @@ async def handle_create_attempt(data: dict):
             
             job_payload = {
                 "attempt_id": attempt.id,
+                # Echoed back on attempt.graded so the lookup hits one partition
+                "attempted_at": attempt.attempted_at.isoformat(),
                 "language": data["language"],
                 "code": harness_code,
                 "original_code": data["code"],
@@ -84,7 +102,8 @@ async def handle_create_attempt(data: dict):
 async def handle_attempt_graded(data: dict):
     """
     Subscribes to 'attempt.graded'
-    Payload: { "attempt_id": 123, "execution_output": "...", "lint_output": "...", "error": "..." }
+    Payload: { "attempt_id": 123, "attempted_at": "...", "execution_output": "...", "lint_output": "...", "error": "..." }
+    attempted_at is optional; when present the lookups prune to one partition.
     """
     print(f"Received graded result for attempt {data.get('attempt_id')}")
     
@@ -94,8 +113,9 @@ async def handle_attempt_graded(data: dict):
     try:
         attempt_id = data.get("attempt_id")
         if not attempt_id: return
+        attempted_at = _parse_timestamp(data.get("attempted_at"))
         
-        attempt = crud.get_attempt_by_id(db, attempt_id)
+        attempt = crud.get_attempt_by_id(db, attempt_id, attempted_at)
         if not attempt:
             print("Attempt not found for grading result")
             return
@@ -108,12 +128,18 @@ async def handle_attempt_graded(data: dict):
             lint_output=data.get("lint_output", "")
         )
         
-        attempt.score = results["score"]
-        attempt.stars = results["stars"]
-        attempt.status = "completed"
+        # Every replica receives every grading result, so only the one whose
+        # update flips the status may fold the attempt into the stats.
+        graded = crud.complete_attempt(db, attempt_id, results["score"], results["stars"], attempted_at)
+        if not graded:
+            db.rollback()
+            print(f"Attempt {attempt_id} already graded, skipping")
+            return
+        
+        crud.record_graded_attempt_stats(db, graded)
         
         db.commit()
-        print(f"Attempt {attempt_id} updated with score {attempt.score}")
+        print(f"Attempt {attempt_id} updated with score {graded.score}")
         
     except Exception as e:
         print(f"Error processing grading result: {e}")
@@ -152,7 +178,7 @@ async def handle_get_user_attempts(data: dict):
         if not user_id:
             return {"error": "Missing user_id"}
         
-        attempts = crud.get_user_attempts(db, user_id)
+        attempts = crud.get_user_attempts(db, user_id, since=_parse_since(data))
         return {"attempts": attempts}
         
     except Exception as e:
@@ -172,7 +198,7 @@ async def handle_get_exercise_attempts(data: dict):
             return {"error": "Missing exercise_id"}
         
         limit = data.get("limit")
-        attempts = crud.get_exercise_attempts(db, exercise_id, limit)
+        attempts = crud.get_exercise_attempts(db, exercise_id, limit, since=_parse_since(data))
         
         return {
             "attempts": [
@@ -188,6 +214,64 @@ async def handle_get_exercise_attempts(data: dict):
         db.close()
 
 
+# Room left in every export message for the {"seq": .., "done": ..} envelope
+_EXPORT_ENVELOPE_BYTES = 1024
+
+def _export_byte_budget() -> int:
+    budget = settings.export_max_chunk_bytes
+    if _nats_client and _nats_client.nc:
+        budget = min(budget, _nats_client.nc.max_payload)
+    return budget - _EXPORT_ENVELOPE_BYTES
+
+async def handle_export_exercise_attempts(data: dict):
+    """
+    Subscribes to 'attempts.exercise.export' (streamed reply)
+    Payload: { "exercise_id": 1, "chunk_size": 100, "since": "2025-09-01T00:00:00" }
+    Yields { "attempts": [...] } chunks read through a server-side cursor,
+    so memory stays flat regardless of how many attempts the exercise has.
+    A chunk is closed early once its serialized size would exceed the NATS
+    max payload, since code_submitted has no length limit.
+    """
+    SessionLocal = get_session_local()
+    db = SessionLocal()
+    
+    try:
+        exercise_id = data.get("exercise_id")
+        if not exercise_id:
+            # Raised so the stream reports it in the terminal message like any other failure
+            raise ValueError("Missing exercise_id")
+        
+        chunk_size = data.get("chunk_size") or settings.export_chunk_size
+        chunk_size = max(1, min(int(chunk_size), settings.export_max_chunk_size))
+        byte_budget = _export_byte_budget()
+        
+        batch = []
+        batch_bytes = 0
+        chunks = crud.iter_exercise_attempts(db, exercise_id, chunk_size, since=_parse_since(data))
+        for chunk in chunks:
+            for a in chunk:
+                row = AttemptResponse.model_validate(a).model_dump(mode='json')
+                row_bytes = len(json.dumps(row).encode()) + 1
+                if row_bytes > byte_budget:
+                    raise ValueError(
+                        f"Attempt {row['id']} is {row_bytes} bytes, larger than the export payload limit"
+                    )
+                
+                if batch and (len(batch) >= chunk_size or batch_bytes + row_bytes > byte_budget):
+                    yield {"attempts": batch}
+                    batch = []
+                    batch_bytes = 0
+                
+                batch.append(row)
+                batch_bytes += row_bytes
+        
+        if batch:
+            yield {"attempts": batch}
+            
+    finally:
+        db.close()
+
+
 async def handle_get_best_attempt(data: dict):
     SessionLocal = get_session_local()
     db = SessionLocal()
@@ -231,6 +315,36 @@ async def handle_get_all_best_attempts(data: dict):
     finally:
         db.close()
 
+async def handle_get_exercise_stats(data: dict):
+    """
+    Subscribes to 'attempts.stats'
+    Payload: { "exercise_id": 1 } or { "exercise_ids": [1, 2, 3] }
+    A single id returns one stats object, a list returns them keyed by id.
+    """
+    SessionLocal = get_session_local()
+    db = SessionLocal()
+    
+    try:
+        exercise_ids = data.get("exercise_ids")
+        if exercise_ids is not None:
+            if not isinstance(exercise_ids, list):
+                return {"error": "exercise_ids must be a list"}
+            
+            stats = crud.get_exercise_stats(db, [int(i) for i in exercise_ids])
+            return {str(exercise_id): s for exercise_id, s in stats.items()}
+        
+        exercise_id = data.get("exercise_id")
+        if not exercise_id:
+            return {"error": "Missing exercise_id"}
+        
+        return crud.get_exercise_stats(db, [int(exercise_id)])[int(exercise_id)]
+        
+    except Exception as e:
+        print(f"Error getting exercise stats: {e}")
+        return {"error": str(e)}
+    finally:
+        db.close()
+
 async def handle_grade_ephemeral(data: dict):
     if not _nats_client:
         return {"error": "NATS client not initialized"}
@@ -1,6 +1,8 @@
 from fastapi import FastAPI
-import logfire
+from fastapi.responses import JSONResponse
 
+import asyncio
+import time
 from contextlib import asynccontextmanager
 import uvicorn
 from src.handlers import(
@@ -8,51 +10,87 @@ from src.handlers import(
     handle_get_attempt,
     handle_get_user_attempts,
     handle_get_exercise_attempts,
+    handle_export_exercise_attempts,
     handle_get_best_attempt,
     handle_get_all_best_attempts,
     handle_grade_ephemeral,
+    handle_get_exercise_stats,
     handle_attempt_graded,
     set_nats_client,
 )
 
 from src.config import settings
-from src.database import init_db
+from src.database import init_db, prewarm_pool
 from src.nats_client import NATSClient
 
 
 from prometheus_fastapi_instrumentator import Instrumentator
 
 nats_client = NATSClient()
-logfire.configure()
+
+async def timed(timings: dict, phase: str, awaitable):
+    started = time.perf_counter()
+    result = await awaitable
+    timings[phase] = round(time.perf_counter() - started, 4)
+    return result
+
+def configure_logfire(app: FastAPI):
+    # logfire is slow to import and only useful with a token, so skip it
+    # entirely on pods that don't export traces. With a token it still runs
+    # at module import: instrument_fastapi has to wrap the app before
+    # Starlette builds its middleware stack, which happens before lifespan
+    # startup, so it can't be deferred to startup or a background task.
+    if not settings.logfire_token:
+        print("Logfire token not set, skipping instrumentation")
+        return
+    
+    import logfire
+    logfire.configure()
+    logfire.instrument_fastapi(app)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("Starting Attempt Service...")
+    app.state.ready = False
+    # Per-phase startup durations, reported by /ready
+    timings = app.state.startup_timings = {}
+    started = time.perf_counter()
     
-    init_db()
+    if settings.run_migrations:
+        await timed(timings, "init_db", asyncio.to_thread(init_db))
     
-    await nats_client.connect()
+    await asyncio.gather(
+        timed(timings, "db_prewarm", asyncio.to_thread(prewarm_pool)),
+        timed(timings, "nats_connect", nats_client.connect())
+    )
     set_nats_client(nats_client) 
+    subscribe_started = time.perf_counter()
 
     await nats_client.subscribe("attempts.create", handle_create_attempt)
     await nats_client.subscribe("attempts.get", handle_get_attempt)
     await nats_client.subscribe("attempts.user", handle_get_user_attempts)
     await nats_client.subscribe("attempts.exercise", handle_get_exercise_attempts)
+    await nats_client.subscribe_stream("attempts.exercise.export", handle_export_exercise_attempts)
     await nats_client.subscribe("attempts.best", handle_get_best_attempt)
     await nats_client.subscribe("attempts.best.all", handle_get_all_best_attempts)
     await nats_client.subscribe("attempts.grade_ephemeral", handle_grade_ephemeral)
+    await nats_client.subscribe("attempts.stats", handle_get_exercise_stats)
     
     await nats_client.subscribe("attempt.graded", handle_attempt_graded)
 
-    print("Attempt Service ready!")
+    timings["subscribe"] = round(time.perf_counter() - subscribe_started, 4)
+    timings["total"] = round(time.perf_counter() - started, 4)
+    app.state.ready = True
+    print(f"Attempt Service ready! Startup timings: {timings}")
 
     yield
     
     print("Shutting down Attempt Service...")
+    app.state.ready = False
     await nats_client.close()
 
 app = FastAPI(title="Attempt Service", lifespan=lifespan)
-logfire.instrument_fastapi(app)
+configure_logfire(app)
 
 # Prometheus metrics
 Instrumentator().instrument(app).expose(app)
@@ -64,5 +102,20 @@ async def health():
         "service": "attempt-service"
     }
 
+# uvicorn only binds the port once lifespan startup has finished, so before
+# that the probe sees connection refused rather than a 503. The 503 covers
+# a lost NATS connection and shutdown.
+@app.get("/ready")
+async def ready():
+    is_ready = getattr(app.state, "ready", False) and nats_client.is_connected
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={
+            "status": "ready" if is_ready else "not ready",
+            "service": "attempt-service",
+            "startup": getattr(app.state, "startup_timings", {})
+        }
+    )
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8003)
\ No newline at end of file
@@ -0,0 +1,104 @@
+import argparse
+import os
+
+from src.database import get_engine, get_session_local, init_db
+from src import crud
+from src import partitions
+from src.config import settings
+
+
+def rebuild_stats():
+    SessionLocal = get_session_local()
+    db = SessionLocal()
+    
+    try:
+        crud.rebuild_exercise_stats(db)
+        print("Exercise stats rebuilt")
+    finally:
+        db.close()
+
+
+def ensure_partitions(months_ahead: int = None):
+    with get_engine().begin() as conn:
+        partitions.ensure_partitions(conn, months_ahead)
+
+
+def archive_partitions(retention_months: int = None, archive_dir: str = None, detach_only: bool = False):
+    archive_dir = archive_dir or settings.partition_archive_dir
+    if not detach_only and not archive_dir:
+        raise SystemExit("archive-partitions needs --archive-dir or PARTITION_ARCHIVE_DIR on durable storage")
+    if archive_dir and not os.path.isdir(archive_dir):
+        raise SystemExit(f"Archive directory {archive_dir} does not exist, is the volume mounted?")
+    
+    with get_engine().begin() as conn:
+        # Tables detached by an earlier run whose dump failed come first
+        leftovers = [name for name, _ in partitions.list_detached_partitions(conn)]
+        expired = partitions.expired_partitions(conn, retention_months)
+    
+    if leftovers and not detach_only:
+        print(f"Resuming archive of previously detached tables: {', '.join(leftovers)}")
+        for table in leftovers:
+            with get_engine().begin() as conn:
+                partitions.archive_table(conn, table, archive_dir)
+    
+    # Detach, dump and drop one partition at a time so a failure leaves at
+    # most one detached table, which the next run picks up again.
+    for table in expired:
+        with get_engine().begin() as conn:
+            partitions.detach_partition(conn, table)
+        
+        if detach_only:
+            continue
+        
+        with get_engine().begin() as conn:
+            partitions.archive_table(conn, table, archive_dir)
+
+
+def migrate_partitioned():
+    with get_engine().begin() as conn:
+        partitions.migrate_to_partitioned(conn)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m src.maintenance",
+        description="Maintenance commands for the attempt service database"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("init-db", help="Create missing tables and partitions")
+    commands.add_parser(
+        "rebuild-stats",
+        help="Wipe and recompute all stats (repair only; init-db backfills on first run). "
+             "Loses history from archived partitions; stop graders first"
+    )
+    
+    ensure = commands.add_parser("ensure-partitions", help="Create upcoming monthly partitions")
+    ensure.add_argument("--months-ahead", type=int, default=None)
+    
+    archive = commands.add_parser("archive-partitions", help="Detach and archive partitions older than the retention window")
+    archive.add_argument("--retention-months", type=int, default=None)
+    archive.add_argument("--archive-dir", default=None, help="Durable location (mounted volume) for the dumps, defaults to PARTITION_ARCHIVE_DIR")
+    archive.add_argument("--detach-only", action="store_true", help="Detach old partitions but keep them as plain tables; a later run without this flag archives them")
+    
+    commands.add_parser(
+        "migrate-partitioned",
+        help="Convert an existing unpartitioned attempts table. Offline: locks the table "
+             "for the whole copy, scale the service to zero first"
+    )
+    
+    args = parser.parse_args(argv)
+    
+    if args.command == "init-db":
+        init_db()
+    elif args.command == "rebuild-stats":
+        rebuild_stats()
+    elif args.command == "ensure-partitions":
+        ensure_partitions(args.months_ahead)
+    elif args.command == "archive-partitions":
+        archive_partitions(args.retention_months, args.archive_dir, args.detach_only)
+    elif args.command == "migrate-partitioned":
+        migrate_partitioned()
+
+
+if __name__ == "__main__":
+    main()
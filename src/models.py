@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Text, DateTime, String
+from sqlalchemy import Column, Integer, BigInteger, Text, DateTime, String, Index
 from sqlalchemy.orm import declarative_base
 from datetime import datetime, timezone
 
@@ -6,13 +6,41 @@ Base = declarative_base()
 
 class Attempt(Base):
     __tablename__ = 'user_exercise_attempts'
+    # Range partitioned by month on attempted_at, see src/partitions.py.
+    # Postgres requires the partition key in the primary key.
+    __table_args__ = (
+        Index('ix_user_exercise_attempts_user_exercise', 'user_id', 'exercise_id'),
+        Index('ix_user_exercise_attempts_exercise_attempted_at', 'exercise_id', 'attempted_at'),
+        {'postgresql_partition_by': 'RANGE (attempted_at)'},
+    )
     
-    id = Column(Integer, primary_key=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, nullable=False)
     exercise_id = Column(Integer, nullable=False)
     
     code_submitted = Column(Text, nullable=False)
     score = Column(Integer, nullable=False, default=0)
     stars = Column(Integer, nullable=False, default=0)
-    attempted_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
-    status = Column(String(20), nullable=False, default='pending')
\ No newline at end of file
+    attempted_at = Column(DateTime, primary_key=True, nullable=False, default=lambda: datetime.now(timezone.utc))
+    status = Column(String(20), nullable=False, default='pending')
+
+
+class ExerciseStats(Base):
+    __tablename__ = 'exercise_attempt_stats'
+    
+    exercise_id = Column(Integer, primary_key=True)
+    attempt_count = Column(Integer, nullable=False, default=0)
+    passed_count = Column(Integer, nullable=False, default=0)
+    score_total = Column(BigInteger, nullable=False, default=0)
+    unique_users = Column(Integer, nullable=False, default=0)
+    stars_0 = Column(Integer, nullable=False, default=0)
+    stars_1 = Column(Integer, nullable=False, default=0)
+    stars_2 = Column(Integer, nullable=False, default=0)
+    stars_3 = Column(Integer, nullable=False, default=0)
+
+
+class ExerciseStatsUser(Base):
+    __tablename__ = 'exercise_attempt_stats_users'
+    
+    exercise_id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, primary_key=True)
@@ -1,6 +1,7 @@
 import nats
 from nats.aio.client import Client as NATS
 import json
+from contextlib import aclosing
 from src.config import settings
 
 class NATSClient:
@@ -11,6 +12,10 @@ class NATSClient:
         self.nc = await nats.connect(settings.nats_url)
         print(f"Connected to NATS at {settings.nats_url}")
         
+    @property
+    def is_connected(self) -> bool:
+        return self.nc is not None and self.nc.is_connected
+        
     async def close(self):
         if self.nc:
             await self.nc.close()
@@ -58,4 +63,43 @@ class NATSClient:
                     )
         
         await self.nc.subscribe(subject, cb=message_handler)
-        print(f"Subscribed to {subject}")
\ No newline at end of file
+        print(f"Subscribed to {subject}")
+
+    async def subscribe_stream(self, subject: str, handler):
+        """
+        Like subscribe, but the handler is an async generator. Every yielded
+        chunk is published to the reply inbox as its own message, followed by
+        a final {"done": true} message so the requester knows to stop reading.
+        """
+        async def message_handler(msg):
+            if not msg.reply:
+                print(f"Ignoring stream request on {subject} without reply inbox")
+                return
+            sent = 0
+            try:
+                data = json.loads(msg.data.decode())
+                # aclosing runs the handler's cleanup (closing its DB cursor)
+                # as soon as publishing fails, not when it is garbage collected.
+                async with aclosing(handler(data)) as chunks:
+                    async for chunk in chunks:
+                        await self.nc.publish(
+                            msg.reply,
+                            json.dumps({**chunk, "seq": sent, "done": False}, default=str).encode()
+                        )
+                        sent += 1
+                        # Wait for the chunk to leave the client buffer so a large
+                        # export never accumulates in memory on our side.
+                        await self.nc.flush()
+                await self.nc.publish(
+                    msg.reply,
+                    json.dumps({"seq": sent, "done": True}).encode()
+                )
+            except Exception as e:
+                print(f"Error streaming message on {subject}: {e}")
+                await self.nc.publish(
+                    msg.reply,
+                    json.dumps({"error": str(e), "seq": sent, "done": True}).encode()
+                )
+        
+        await self.nc.subscribe(subject, cb=message_handler)
+        print(f"Subscribed to {subject} (stream)")
\ No newline at end of file
@@ -0,0 +1,235 @@
+import os
+import re
+import subprocess
+from datetime import date, datetime, timezone
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, make_url
+
+from src.config import settings
+from src.models import Attempt
+
+PARENT_TABLE = Attempt.__tablename__
+DEFAULT_PARTITION = f"{PARENT_TABLE}_default"
+LEGACY_TABLE = f"{PARENT_TABLE}_legacy"
+
+_PARTITION_NAME = re.compile(rf"^{PARENT_TABLE}_p(\d{{4}})_(\d{{2}})$")
+
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT_TABLE}_p{month.year:04d}_{month.month:02d}"
+
+
+def is_partitioned(conn: Connection) -> bool:
+    return conn.execute(text("""
+        SELECT 1 FROM pg_partitioned_table pt
+        JOIN pg_class c ON c.oid = pt.partrelid
+        WHERE c.relname = :name AND pg_table_is_visible(c.oid)
+    """), {"name": PARENT_TABLE}).first() is not None
+
+
+def list_partitions(conn: Connection) -> list[tuple[str, date]]:
+    """
+    Returns the monthly partitions attached to the parent table as
+    (name, month) pairs, oldest first. The default partition is skipped.
+    """
+    rows = conn.execute(text("""
+        SELECT child.relname FROM pg_inherits i
+        JOIN pg_class parent ON parent.oid = i.inhparent
+        JOIN pg_class child ON child.oid = i.inhrelid
+        WHERE parent.relname = :name AND pg_table_is_visible(parent.oid)
+    """), {"name": PARENT_TABLE}).scalars().all()
+
+    partitions = []
+    for name in rows:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def list_detached_partitions(conn: Connection) -> list[tuple[str, date]]:
+    """
+    Returns monthly tables that match the partition naming but are no longer
+    attached, e.g. left behind by an archive run whose dump failed.
+    """
+    rows = conn.execute(text("""
+        SELECT c.relname FROM pg_class c
+        WHERE c.relkind = 'r' AND NOT c.relispartition
+          AND c.relname LIKE :prefix AND pg_table_is_visible(c.oid)
+    """), {"prefix": f"{PARENT_TABLE}_p%"}).scalars().all()
+
+    partitions = []
+    for name in rows:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def _relation_exists(conn: Connection, name: str) -> bool:
+    return conn.execute(text("SELECT to_regclass(:name)"), {"name": f'"{name}"'}).scalar() is not None
+
+
+def create_partition(conn: Connection, month: date):
+    """
+    Creates the partition for `month`. Rows for that month that already
+    landed in the default partition (because maintenance fell behind) would
+    make a plain CREATE fail, so they are moved into the new partition with
+    the default partition detached, then it is reattached.
+    """
+    name = partition_name(month)
+    if _relation_exists(conn, name):
+        return
+
+    lower, upper = month.isoformat(), add_months(month, 1).isoformat()
+    bounds = f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+    in_range = f"attempted_at >= '{lower}' AND attempted_at < '{upper}'"
+
+    stranded = _relation_exists(conn, DEFAULT_PARTITION) and conn.execute(text(
+        f'SELECT 1 FROM "{DEFAULT_PARTITION}" WHERE {in_range} LIMIT 1'
+    )).first() is not None
+
+    if not stranded:
+        conn.execute(text(f'CREATE TABLE "{name}" PARTITION OF "{PARENT_TABLE}" {bounds}'))
+        return
+
+    conn.execute(text(f'ALTER TABLE "{PARENT_TABLE}" DETACH PARTITION "{DEFAULT_PARTITION}"'))
+    conn.execute(text(f'CREATE TABLE "{name}" PARTITION OF "{PARENT_TABLE}" {bounds}'))
+    moved = conn.execute(text(
+        f'INSERT INTO "{name}" SELECT * FROM "{DEFAULT_PARTITION}" WHERE {in_range}'
+    )).rowcount
+    conn.execute(text(f'DELETE FROM "{DEFAULT_PARTITION}" WHERE {in_range}'))
+    conn.execute(text(f'ALTER TABLE "{PARENT_TABLE}" ATTACH PARTITION "{DEFAULT_PARTITION}" DEFAULT'))
+    print(f"Moved {moved} rows from {DEFAULT_PARTITION} into {name}")
+
+
+def ensure_partitions(conn: Connection, months_ahead: int = None, start: date = None):
+    """
+    Creates monthly partitions from `start` (default: the current month)
+    through `months_ahead` months into the future, plus a default partition
+    that catches rows outside every range if maintenance falls behind.
+    """
+    if months_ahead is None:
+        months_ahead = settings.partition_months_ahead
+
+    current = month_start(datetime.now(timezone.utc).date())
+    month = month_start(start) if start else current
+    last = add_months(current, months_ahead)
+
+    while month <= last:
+        create_partition(conn, month)
+        month = add_months(month, 1)
+
+    conn.execute(text(
+        f'CREATE TABLE IF NOT EXISTS "{DEFAULT_PARTITION}" PARTITION OF "{PARENT_TABLE}" DEFAULT'
+    ))
+    print(f"Partitions ensured through {last.isoformat()}")
+
+
+def expired_partitions(conn: Connection, retention_months: int = None) -> list[str]:
+    """Attached monthly partitions that end before the retention window."""
+    if retention_months is None:
+        retention_months = settings.partition_retention_months
+
+    cutoff = add_months(month_start(datetime.now(timezone.utc).date()), -retention_months)
+    return [name for name, month in list_partitions(conn) if add_months(month, 1) <= cutoff]
+
+
+def detach_partition(conn: Connection, name: str):
+    """Detaches one partition; it becomes a plain table, data untouched."""
+    conn.execute(text(f'ALTER TABLE "{PARENT_TABLE}" DETACH PARTITION "{name}"'))
+    print(f"Detached partition {name}")
+
+
+def _libpq_url() -> str:
+    url = make_url(settings.database_url).set(drivername="postgresql")
+    return url.render_as_string(hide_password=False)
+
+
+def archive_table(conn: Connection, table: str, archive_dir: str) -> str:
+    """
+    Dumps a detached partition to a compressed pg_dump archive in
+    `archive_dir`, which must be durable storage (e.g. a mounted volume),
+    checks the archive with pg_restore --list and only then drops the table.
+    """
+    if not archive_dir:
+        raise ValueError("An archive directory on durable storage is required")
+    if not os.path.isdir(archive_dir):
+        raise ValueError(f"Archive directory {archive_dir} does not exist, is the volume mounted?")
+
+    path = os.path.join(archive_dir, f"{table}.dump")
+
+    subprocess.run(
+        [
+            "pg_dump", "--format=custom", "--compress=9",
+            f"--table={table}", f"--file={path}", _libpq_url()
+        ],
+        check=True
+    )
+
+    listing = subprocess.run(
+        ["pg_restore", "--list", path],
+        check=True, capture_output=True, text=True
+    ).stdout
+    if not re.search(rf"\bTABLE DATA \S+ {re.escape(table)}\b", listing):
+        raise RuntimeError(f"Archive {path} does not contain data for {table}, keeping the table")
+
+    conn.execute(text(f'DROP TABLE "{table}"'))
+    print(f"Archived {table} to {path}")
+
+    return path
+
+
+def migrate_to_partitioned(conn: Connection):
+    """
+    Converts a pre-partitioning user_exercise_attempts table in place: the
+    old table is renamed, the partitioned table is created with partitions
+    covering the existing history, rows are copied over and the id sequence
+    is carried forward. Runs inside the caller's transaction.
+    
+    This is an offline migration: the rename holds an ACCESS EXCLUSIVE lock
+    on the attempts table until commit, so every service query blocks for
+    the whole copy. Scale the service to zero before running it.
+    """
+    if is_partitioned(conn):
+        print(f"{PARENT_TABLE} is already partitioned")
+        return
+
+    conn.execute(text(f'ALTER TABLE "{PARENT_TABLE}" RENAME TO "{LEGACY_TABLE}"'))
+    conn.execute(text(
+        f'ALTER TABLE "{LEGACY_TABLE}" RENAME CONSTRAINT "{PARENT_TABLE}_pkey" TO "{LEGACY_TABLE}_pkey"'
+    ))
+    conn.execute(text(
+        f'ALTER SEQUENCE IF EXISTS "{PARENT_TABLE}_id_seq" RENAME TO "{LEGACY_TABLE}_id_seq"'
+    ))
+
+    Attempt.__table__.create(conn)
+
+    oldest = conn.execute(text(f'SELECT min(attempted_at) FROM "{LEGACY_TABLE}"')).scalar()
+    ensure_partitions(conn, start=oldest.date() if oldest else None)
+
+    conn.execute(text(f"""
+        INSERT INTO "{PARENT_TABLE}"
+            (id, user_id, exercise_id, code_submitted, score, stars, attempted_at, status)
+        SELECT id, user_id, exercise_id, code_submitted, score, stars,
+               COALESCE(attempted_at, now() AT TIME ZONE 'utc'), status
+        FROM "{LEGACY_TABLE}"
+    """))
+    conn.execute(text(
+        f"SELECT setval(pg_get_serial_sequence('{PARENT_TABLE}', 'id'), "
+        f'COALESCE((SELECT max(id) FROM "{PARENT_TABLE}"), 0) + 1, false)'
+    ))
+    conn.execute(text(f'DROP TABLE "{LEGACY_TABLE}"'))
+    print(f"Migrated {PARENT_TABLE} to a partitioned table")